@@ -0,0 +1,109 @@
+"""Extraction of the videos from the playlist json.
+
+Kept apart from :mod:`pytube.contrib.playlist` and free of async code so it
+can be compiled with mypyc, see setup.py. The json values are typed as
+``Any`` as they can also be lazy ``simdjson`` objects.
+"""
+import logging
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+logger = logging.getLogger(__name__)
+
+WATCH_URL = "https://www.youtube.com/watch?v="
+
+
+def deep_get(data: Any, *keys: Union[str, int]) -> Any:
+    """Walk a parsed json tree along the given keys and indexes
+
+    :param data: Parsed json to walk
+    :param keys: Dict keys and list indexes making up the path
+    :returns: The value at the end of the path, or None if it doesn't exist
+    """
+    try:
+        for key in keys:
+            data = data[key]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return data
+
+
+def extract_videos(initial_data: Any) -> Tuple[List[str], Optional[str]]:
+    """Extracts videos from a json page
+
+    :param dict initial_data: Parsed json extracted from the page or the
+        last server response
+    :rtype: Tuple[List[str], Optional[str]]
+    :returns: Tuple containing a list of up to 100 video urls and
+        a continuation token, if more videos are available
+    """
+    videos, continuation = extract_renderers(initial_data)
+    return watch_urls(videos), continuation
+
+
+def extract_renderers(initial_data: Any) -> Tuple[Any, Optional[str]]:
+    """Extracts the video renderers from a json page
+
+    :param dict initial_data: Parsed json extracted from the page or the
+        last server response
+    :rtype: Tuple[List[dict], Optional[str]]
+    :returns: Tuple containing a list of up to 100 video renderers and
+        a continuation token, if more videos are available
+    """
+    # this is the json tree structure, if the json was extracted from
+    # html
+    videos = None
+    section_contents = deep_get(
+        initial_data,
+        "contents", "twoColumnBrowseResultsRenderer", "tabs", 0,
+        "tabRenderer", "content", "sectionListRenderer", "contents"
+    )
+    if section_contents:
+        # Playlist without submenus, then playlist with submenus
+        for section in section_contents[:2]:
+            videos = deep_get(
+                section,
+                "itemSectionRenderer", "contents", 0,
+                "playlistVideoListRenderer", "contents"
+            )
+            if videos is not None:
+                break
+    if videos is None:
+        # this is the json tree structure, if the json was directly sent
+        # by the server in a continuation response
+        # no longer a list and no longer has the "response" key
+        videos = deep_get(
+            initial_data,
+            "onResponseReceivedActions", 0,
+            "appendContinuationItemsAction", "continuationItems"
+        )
+    if videos is None:
+        logger.info("no videos found in the playlist json")
+        return [], None
+
+    continuation = deep_get(
+        videos,
+        -1, "continuationItemRenderer", "continuationEndpoint",
+        "continuationCommand", "token"
+    )
+    # the continuation item is left in, it is skipped by watch_urls
+    # rather than copying every other item into a new list
+    return videos, continuation
+
+
+def watch_urls(videos: Any) -> List[str]:
+    """Build the complete video urls of the given video renderers
+
+    :param List[dict] videos: Video renderers of a page
+    :rtype: List[str]
+    :returns: List of video urls, without duplicates
+    """
+    # only extract the video ids from the video data, removing duplicates
+    return list(dict.fromkeys(
+        f"{WATCH_URL}{video['playlistVideoRenderer']['videoId']}"
+        for video in videos
+        if "playlistVideoRenderer" in video
+    ))
@@ -1,28 +1,60 @@
 """Module to download a complete playlist from a youtube channel."""
+import asyncio
 import json
 import logging
+import re
 from collections.abc import Sequence
 from datetime import date
 from datetime import datetime
+from typing import Any
 from typing import Dict, Tuple
 from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Set
 from typing import Union
 from aiohttp import ClientSession
 from async_property import async_property
 from async_property import async_cached_property
 
+try:
+    import simdjson
+except ImportError:  # pragma: no cover
+    simdjson = None
+
 from pytube import extract
 from pytube import request
 from pytube import YouTube
+from pytube.contrib._playlist_fast import extract_renderers
+from pytube.contrib._playlist_fast import extract_videos
+from pytube.contrib._playlist_fast import watch_urls
+from pytube.contrib._playlist_fast import WATCH_URL
 from pytube.helpers import cache
 from pytube.helpers import install_proxy
 from pytube.helpers import regex_search
-from pytube.helpers import uniqueify
 
 logger = logging.getLogger(__name__)
 
+_LAST_UPDATED_RE = re.compile(r"Last updated on (\w{3}) (\d{1,2}), (\d{4})")
+
+# The same for every continuation request
+_CONTINUATION_HEADERS = {
+    "X-YouTube-Client-Name": "1",
+    "X-YouTube-Client-Version": "2.20200720.00.02",
+    "X-Origin": "https://www.youtube.com",
+    # the body is sent already serialized
+    "Content-Type": "application/json"
+}
+_CONTINUATION_CONTEXT = json.dumps(
+    {
+        "client": {
+            "clientName": "WEB",
+            "clientVersion": "2.20200720.00.02"
+        }
+    },
+    separators=(",", ":")
+).encode()
+
 
 class Playlist:
     """Load a YouTube playlist with URL"""
@@ -39,6 +71,7 @@ class Playlist:
         self._ytcfg = None
         self._initial_data = None
         self._sidebar_info = None
+        self._continuation_url = None
 
         self._playlist_id = None
 
@@ -89,161 +122,172 @@ class Playlist:
             return self._sidebar_info
 
     async def _paginate(
-        self, until_watch_id: Optional[str] = None
+        self, until_watch_id: Optional[str] = None, pages_ahead: int = 8
     ) -> Iterable[List[str]]:
-        """Parse the video links from the page source, yields the /watch?v=
-        part from video link
+        """Parse the video links from the page source, yields the complete
+        video links
 
         :param until_watch_id Optional[str]: YouTube Video watch id until
             which the playlist should be read.
+        :param int pages_ahead: Maximum number of pages that are fetched
+            ahead of the caller. The pages are still requested one after
+            another, as each continuation comes from the previous page.
 
         :rtype: Iterable[List[str]]
-        :returns: Iterable of lists of YouTube watch ids
+        :returns: Iterable of lists of YouTube video URLs
         """
-        videos_urls, continuation = self._extract_videos(
-            json.dumps(extract.initial_data(await self.html))
+        # shares the parsed page with the other properties, e.g. title
+        videos_urls, continuation = extract_videos(
+            await self.initial_data
         )
-        if until_watch_id:
-            try:
-                trim_index = videos_urls.index(f"/watch?v={until_watch_id}")
-                yield videos_urls[:trim_index]
-                return
-            except ValueError:
-                pass
-        yield videos_urls
+        until_url = f"{WATCH_URL}{until_watch_id}" if until_watch_id else None
+        if until_url in videos_urls:
+            # the rest of the playlist isn't needed
+            continuation = None
 
         # Extraction from a playlist only returns 100 videos at a time
-        # if self._extract_videos returns a continuation there are more
-        # than 100 songs inside a playlist, so we need to add further requests
-        # to gather all of them
-        if continuation:
-            load_more_url, headers, data = await self._build_continuation_url(continuation)
-        else:
-            load_more_url, headers, data = None, None, None
-
-        while load_more_url and headers and data:  # there is an url found
-            logger.debug("load more url: %s", load_more_url)
-            # requesting the next page of videos with the url generated from the
-            # previous page, needs to be a post
-            req = await request.post(load_more_url, self._session, extra_headers=headers, data=data)
-            # extract up to 100 songs from the page loaded
-            # returns another continuation if more videos are available
-            videos_urls, continuation = self._extract_videos(req)
-            if until_watch_id:
-                try:
-                    trim_index = videos_urls.index(f"/watch?v={until_watch_id}")
-                    yield videos_urls[:trim_index]
-                    return
-                except ValueError:
-                    pass
-            yield videos_urls
-
+        # if extract_videos returns a continuation there are more
+        # than 100 songs inside a playlist, so further requests are made in
+        # the background while the pages already fetched are consumed
+        pages: asyncio.Queue = asyncio.Queue(maxsize=pages_ahead)
+        pages.put_nowait(videos_urls)
+        producer = asyncio.ensure_future(
+            self._fetch_pages(continuation, pages, until_url)
+        )
+        # videos can be repeated across pages, only yield them once
+        seen: Set[str] = set()
+        try:
+            while True:
+                videos_urls = await pages.get()
+                if videos_urls is None:
+                    break
+                videos_urls = [url for url in videos_urls if url not in seen]
+                seen.update(videos_urls)
+                if until_url:
+                    try:
+                        trim_index = videos_urls.index(until_url)
+                        yield videos_urls[:trim_index]
+                        return
+                    except ValueError:
+                        pass
+                yield videos_urls
+            # re-raise any error hit while requesting the pages
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            elif not producer.cancelled():
+                # retrieve any error, so it isn't logged as never retrieved
+                producer.exception()
+
+    async def _fetch_pages(
+        self,
+        continuation: Optional[str],
+        pages: asyncio.Queue,
+        until_url: Optional[str] = None
+    ) -> None:
+        """Follow the continuation chain, queueing the video urls of each page
+
+        The queue is closed with ``None`` once there are no more pages, the
+        page holding ``until_url`` was queued, or if a request fails.
+
+        :param str continuation: Continuation extracted from the first page
+        :param asyncio.Queue pages: Queue the pages of video urls are put on
+        :param str until_url: Video url after which no more pages are needed
+        """
+        next_page = None
+        try:
             if continuation:
-                load_more_url, headers, data = await self._build_continuation_url(
-                    continuation
-                )
-            else:
-                load_more_url, headers, data = None, None, None
+                next_page = asyncio.ensure_future(self._request_page(continuation))
+            while next_page:
+                page_data = await next_page
+                # extract up to 100 songs from the page loaded
+                # returns another continuation if more videos are available
+                videos, continuation = extract_renderers(page_data)
+                page_urls = None
+                if until_url:
+                    # the urls are needed first to know whether the next page
+                    # is requested at all
+                    page_urls = watch_urls(videos)
+                    if until_url in page_urls:
+                        continuation = None
+                # otherwise request the next page before building the watch
+                # urls of this one, so the network and the parsing overlap
+                if continuation:
+                    next_page = asyncio.ensure_future(
+                        self._request_page(continuation)
+                    )
+                else:
+                    next_page = None
+                if page_urls is None:
+                    page_urls = watch_urls(videos)
+                await pages.put(page_urls)
+        except asyncio.CancelledError:
+            # the consumer is gone, nothing reads the queue any more
+            # (CancelledError is an Exception before python 3.8)
+            raise
+        except Exception:
+            await pages.put(None)
+            raise
+        finally:
+            if next_page:
+                next_page.cancel()
+        await pages.put(None)
+
+    async def _request_page(self, continuation: str) -> Any:
+        """Request the page of videos following the given continuation
 
-    async def _build_continuation_url(self, continuation: str) -> Tuple[str, dict, dict]:
+        :param str continuation: Continuation extracted from the json response
+            of the last page
+        :rtype: dict or simdjson.Object
+        :returns: Parsed json response of the server, as a lazy
+            simdjson.Object if pysimdjson is installed
+        """
+        load_more_url, headers, data = await self._build_continuation_url(
+            continuation
+        )
+        logger.debug("load more url: %s", load_more_url)
+        # requesting the next page of videos with the url generated from
+        # the previous page, needs to be a post
+        if simdjson is None:
+            return await request.post_json(
+                load_more_url, self._session, extra_headers=headers, data=data
+            )
+        raw_json = await request.post(
+            load_more_url,
+            self._session,
+            extra_headers=headers,
+            data=data,
+            as_bytes=True
+        )
+        # only the values that are looked up get turned into python objects,
+        # a new parser is needed as the previous page may still be referenced
+        return simdjson.Parser().parse(raw_json)
+
+    async def _build_continuation_url(self, continuation: str) -> Tuple[str, dict, bytes]:
         """Helper method to build the url and headers required to request
         the next page of videos
 
         :param str continuation: Continuation extracted from the json response
             of the last page
-        :rtype: Tuple[str, dict, dict]
-        :returns: Tuple of an url and required headers for the next http
-            request
+        :rtype: Tuple[str, dict, bytes]
+        :returns: Tuple of an url, required headers and the serialized body
+            for the next http request
         """
-        return (
-            (
-                # was changed to this format (and post requests)
-                # between 2021.03.02 and 2021.03.03
+        if not self._continuation_url:
+            # was changed to this format (and post requests)
+            # between 2021.03.02 and 2021.03.03
+            self._continuation_url = (
                 "https://www.youtube.com/youtubei/v1/browse?key="
                 f"{await self.yt_api_key}"
-            ),
-            {
-                "X-YouTube-Client-Name": "1",
-                "X-YouTube-Client-Version": "2.20200720.00.02",
-                "X-Origin": "https://www.youtube.com"
-            },
-            # extra data required for post request
-            {
-                "continuation": continuation,
-                "context": {
-                    "client": {
-                        "clientName": "WEB",
-                        "clientVersion": "2.20200720.00.02"
-                    }
-                }
-            }
-        )
-
-    @staticmethod
-    def _extract_videos(raw_json: str) -> Tuple[List[str], Optional[str]]:
-        """Extracts videos from a raw json page
-
-        :param str raw_json: Input json extracted from the page or the last
-            server response
-        :rtype: Tuple[List[str], Optional[str]]
-        :returns: Tuple containing a list of up to 100 video watch ids and
-            a continuation token, if more videos are available
-        """
-        initial_data = json.loads(raw_json)
-        try:
-            # this is the json tree structure, if the json was extracted from
-            # html
-            section_contents = initial_data["contents"][
-                "twoColumnBrowseResultsRenderer"][
-                "tabs"][0]["tabRenderer"]["content"][
-                "sectionListRenderer"]["contents"]
-            try:
-                # Playlist without submenus
-                important_content = section_contents[
-                    0]["itemSectionRenderer"][
-                    "contents"][0]["playlistVideoListRenderer"]
-            except (KeyError, IndexError, TypeError):
-                # Playlist with submenus
-                important_content = section_contents[
-                    1]["itemSectionRenderer"][
-                    "contents"][0]["playlistVideoListRenderer"]
-            videos = important_content["contents"]
-        except (KeyError, IndexError, TypeError):
-            try:
-                # this is the json tree structure, if the json was directly sent
-                # by the server in a continuation response
-                # no longer a list and no longer has the "response" key
-                important_content = initial_data['onResponseReceivedActions'][0][
-                    'appendContinuationItemsAction']['continuationItems']
-                videos = important_content
-            except (KeyError, IndexError, TypeError) as p:
-                logger.info(p)
-                return [], None
-
-        try:
-            continuation = videos[-1]['continuationItemRenderer'][
-                'continuationEndpoint'
-            ]['continuationCommand']['token']
-            videos = videos[:-1]
-        except (KeyError, IndexError):
-            # if there is an error, no continuation is available
-            continuation = None
-
-        # remove duplicates
+            )
         return (
-            uniqueify(
-                list(
-                    # only extract the video ids from the video data
-                    map(
-                        lambda x: (
-                            f"/watch?v="
-                            f"{x['playlistVideoRenderer']['videoId']}"
-                        ),
-                        videos
-                    )
-                ),
-            ),
-            continuation,
+            self._continuation_url,
+            _CONTINUATION_HEADERS,
+            # extra data required for post request, only the continuation
+            # changes so the rest is serialized once
+            b'{"continuation":' + json.dumps(continuation).encode()
+            + b',"context":' + _CONTINUATION_CONTEXT + b'}'
         )
 
     async def trimmed(self, video_id: str) -> Iterable[str]:
@@ -253,38 +297,65 @@ class Playlist:
         [1,2]
         :type video_id: str
             video ID to trim the returned list of playlist URLs at
-        :rtype: List[str]
+        :rtype: Iterable[str]
         :returns:
-            List of video URLs from the playlist trimmed at the given ID
+            Iterable of video URLs from the playlist trimmed at the given ID
         """
-        for page in await self._paginate(until_watch_id=video_id):
-            yield (self._video_url(watch_path) for watch_path in page)
-
-    # @async_cached_property  # type: ignore
-    # async def video_urls(self) -> List[str]:
-    #     """Complete links of all the videos in playlist
-
-    #     :rtype: List[str]
-    #     :returns: List of video URLs
-    #     """
-    #     return [
-    #         self._video_url(video)
-    #         async for page in await self._paginate()
-    #         for video in page
-    #     ]
-
-    async def video_urls(self) -> Iterable[str]:
-        async for page in self._paginate():
-            for vid in page:
-                yield self._video_url(vid)
+        async for page in self._paginate(until_watch_id=video_id):
+            for url in page:
+                yield url
+
+    @async_cached_property  # type: ignore
+    async def video_urls(self) -> List[str]:
+        """Complete links of all the videos in playlist
+
+        The playlist is only paginated once, later calls return the cached
+        list until :meth:`refresh` is called.
+
+        :rtype: List[str]
+        :returns: List of video URLs
+        """
+        return [
+            url
+            async for page in self._paginate()
+            for url in page
+        ]
+
+    async def iter_video_urls(self) -> Iterable[str]:
+        """Yields the complete links of all the videos in playlist
+
+        :rtype: Iterable[str]
+        :returns: Iterable of video URLs
+        """
+        for url in await self.video_urls:
+            yield url
 
     async def videos(self) -> Iterable[YouTube]:
         """Yields YouTube objects of videos in this playlist
 
-        :rtype: List[YouTube]
-        :returns: List of YouTube
+        :rtype: Iterable[YouTube]
+        :returns: Iterable of YouTube
+        """
+        for url in await self.video_urls:
+            # sharing the session reuses the connections to youtube
+            yield YouTube(url, session=self._session)
+
+    def refresh(self) -> None:
+        """Clear the cached playlist page and videos, so the next access
+        fetches them again
         """
-        yield (YouTube(url) for url in await self.video_urls)
+        self._html = None
+        self._ytcfg = None
+        self._initial_data = None
+        self._sidebar_info = None
+        # holds the api key of the old ytcfg
+        self._continuation_url = None
+        for name in ("video_urls", "last_updated", "title"):
+            try:
+                delattr(self, name)
+            except KeyError:
+                # not loaded yet
+                pass
 
     # def __getitem__(self, i: Union[slice, int]) -> Union[str, List[str]]:
     #     return self.video_urls[i]
@@ -297,9 +368,7 @@ class Playlist:
 
     @async_cached_property
     async def last_updated(self) -> Optional[date]:
-        date_match = re.search(
-            r"Last updated on (\w{3}) (\d{1,2}), (\d{4})", await self.html
-        )
+        date_match = _LAST_UPDATED_RE.search(await self.html)
         if date_match:
             month, day, year = date_match.groups()
             return datetime.strptime(
@@ -380,7 +449,3 @@ class Playlist:
         :rtype: str
         """
         return f'https://www.youtube.com/channel/{(await self.owner_id)}'
-
-    @staticmethod
-    def _video_url(watch_path: str):
-        return f"https://www.youtube.com{watch_path}"
@@ -1,23 +1,48 @@
 """Implements a simple wrapper around urlopen."""
-import json
 import logging
-from functools import lru_cache
 import re
 import socket
+from collections import deque
+from collections import OrderedDict
+from http.cookies import SimpleCookie
 from urllib import parse
 from urllib.error import URLError
 from urllib.request import Request
 from urllib.request import urlopen
+from types import MappingProxyType
 import asyncio
 import aiohttp
+import yarl
 from async_property import async_property
 
+try:
+    import orjson as _json
+except ImportError:  # pragma: no cover
+    import json as _json
+
 from pytube.exceptions import RegexMatchError, MaxRetriesExceeded, PytubeError
-from pytube.helpers import regex_search
 
 logger = logging.getLogger(__name__)
 default_range_size = 9437184  # 9MB
-default_chunk_size = 4096  # 4kb
+default_chunk_size = 65536  # 64kb
+
+_SEGMENT_COUNT_RE = re.compile(rb'Segment-Count: (\d+)')
+_SEGMENT_COUNT_TAIL_SIZE = 64
+
+# Sizes already fetched by filesize and seq_filesize, keyed on url
+_FILESIZE_CACHE_SIZE = 128
+_filesize_cache: "OrderedDict[str, int]" = OrderedDict()
+_seq_filesize_cache: "OrderedDict[str, int]" = OrderedDict()
+
+# Accepts the cookie consent, no account cookies are sent by default
+_CONSENT_COOKIE = SimpleCookie("CONSENT=YES+GB.en+20150628-20-0; Domain=.youtube.com; Path=/")
+
+# Sent with every request, built once rather than on each call
+_BASE_HEADERS = MappingProxyType({
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.0 Safari/605.1.15",
+    "Accept-Language": "en-gb",
+    "Accept": "text/html,application/xhtml+xml,application/json,application/xml,*/*",
+})
 
 
 async def _execute_request(
@@ -28,23 +53,25 @@ async def _execute_request(
     data=None,
     timeout=900
 ):
-    base_headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/12.0 Safari/605.1.15",
-        "Accept-Language": "en-gb",
-        "Accept": "text/html,application/xhtml+xml,application/json,application/xml,*/*",
-        "Cookie": " SIDCC=AJi4QfH98WcrVkkwkemQMRQ9WZk9asesce9uEBJkCoSZx7KTeRNtuzR27BMQI2egTnqm88zh5X8; __Secure-3PSIDCC=AJi4QfFQwZXPSNQg6UMBf5qN10JKZXOo5rF_bNIt49K-rjiVAenqPrDUOIidVRuIVX2VuuXWgTuh; PREF=f6=80&cvdm=grid&tz=Europe.London&al=en&f1=50000000&f5=20030; YSC=LX5Yqn1VDIY; SID=7gcQhFI6EGi5fTesrHcRi7R8Kr7hATYaPzfFKRMKbU683gEa3lCY9Cxwp5Qvx95NzW0iJw.; __Secure-3PSID=7gcQhFI6EGi5fTesrHcRi7R8Kr7hATYaPzfFKRMKbU683gEasPa2dANKe7n6oJFYyNl3zQ.; VISITOR_INFO1_LIVE=yMho0O5Fu8c; LOGIN_INFO=AFmmF2swRgIhAID-B4DkkwhR-1gfK2OiiNzQnI9wvr4u2V8t9t_EelE4AiEA0f9f0va-cI6W4fuiUY1csuXBcGrtMesF0qClM6QKo1Q:QUQ3MjNmd0pST1pxNnZtcjBEeVZaWEIxeTdjd2tSX0NRUG9aS0xMbm9OUjF5cVhWS05pcmZRUlJxTW5xeElUWFZfM25COE5MYUNEbWQtX3YtMVo1elNHSUo5dUxKNk9QSTE4QU1TbXZQQUtiUzBENWhlR2lRVkoyWGRJVmVwRXA5MFdTc2JCNmZoOUZhb0ZaWWYwM19VanlydGZYMjEtMHZxX0FxNF8tbnBwRVIxeVB1dElIdUdDM1g1bGNyV29jT3NSWVAwTVZtRGlM; APISID=9Ypo17XlCCqRQOqg/AGiSpUTfb32XlzW5y; CONSENT=YES+GB.en+20150628-20-0; HSID=AVfH2Ju5Ehm1Mb2fQ; SAPISID=pga-i3racg1AaWor/Au9F8Y1xXPhYV7Wa4; SSID=APSW8jzRJN6bFhee7; __Secure-3PAPISID=pga-i3racg1AaWor/Au9F8Y1xXPhYV7Wa4"}
     if headers:
-        base_headers.update(headers)
+        request_headers = {**_BASE_HEADERS, **headers}
+    else:
+        request_headers = _BASE_HEADERS
     # if data:
     #     # encode data for request
     #     data = bytes(json.dumps(data), "utf-8")
+    if isinstance(data, bytes):
+        # already serialized by the caller
+        body = {"data": data}
+    else:
+        body = {"json": data}
     if url.lower().startswith("http"):
         try:
             resp = await session.request(
                     method,
                     url,
-                    headers=base_headers,
-                    json=data)
+                    headers=request_headers,
+                    **body)
             if resp.status == 400:
                 raise PytubeError(f"Not 200 code, code={resp.status}")
             else:
@@ -56,16 +83,18 @@ async def _execute_request(
         raise ValueError("Invalid URL")
 
 
-async def get(url, session, extra_headers=None, timeout=900):
+async def get(url, session, extra_headers=None, timeout=900, as_bytes=False):
     """Send an http GET request.
 
     :param str url:
         The URL to perform the GET request for.
     :param dict extra_headers:
         Extra headers to add to the request
-    :rtype: str
+    :param bool as_bytes:
+        Return the raw response body instead of decoding it
+    :rtype: str or bytes
     :returns:
-        UTF-8 encoded string of response
+        UTF-8 encoded string of response, or the raw bytes if as_bytes
     """
     if extra_headers is None:
         extra_headers = {}
@@ -76,21 +105,26 @@ async def get(url, session, extra_headers=None, timeout=900):
         headers=extra_headers,
         timeout=timeout
     )
+    if as_bytes:
+        return await response.read()
     return await response.text()
 
 
-async def post(url, session, extra_headers=None, data=None, timeout=900):
+async def post(url, session, extra_headers=None, data=None, timeout=900, as_bytes=False):
     """Send an http POST request.
 
     :param str url:
         The URL to perform the POST request for.
     :param dict extra_headers:
         Extra headers to add to the request
-    :param dict data:
-        The data to send on the POST request
-    :rtype: str
+    :param data:
+        The data to send on the POST request, bytes are sent as they are
+    :type data: dict or bytes
+    :param bool as_bytes:
+        Return the raw response body instead of decoding it
+    :rtype: str or bytes
     :returns:
-        UTF-8 encoded string of response
+        UTF-8 encoded string of response, or the raw bytes if as_bytes
     """
     # could technically be implemented in get,
     # but to avoid confusion implemented like this
@@ -109,55 +143,163 @@ async def post(url, session, extra_headers=None, data=None, timeout=900):
         data=data,
         timeout=timeout
     )
+    if as_bytes:
+        return await response.read()
     return await response.text()
 
 
+async def get_json(url, session, extra_headers=None, timeout=900):
+    """Send an http GET request and parse the json response.
+
+    The raw body is handed to the json parser, skipping the charset
+    detection and decoding done by response.text().
+
+    :param str url:
+        The URL to perform the GET request for.
+    :param dict extra_headers:
+        Extra headers to add to the request
+    :rtype: dict
+    :returns:
+        Parsed json of the response
+    """
+    return _json.loads(
+        await get(
+            url,
+            session,
+            extra_headers=extra_headers,
+            timeout=timeout,
+            as_bytes=True
+        )
+    )
+
+
+async def post_json(url, session, extra_headers=None, data=None, timeout=900):
+    """Send an http POST request and parse the json response.
+
+    The raw body is handed to the json parser, skipping the charset
+    detection and decoding done by response.text().
+
+    :param str url:
+        The URL to perform the POST request for.
+    :param dict extra_headers:
+        Extra headers to add to the request
+    :param data:
+        The data to send on the POST request, bytes are sent as they are
+    :type data: dict or bytes
+    :rtype: dict
+    :returns:
+        Parsed json of the response
+    """
+    return _json.loads(
+        await post(
+            url,
+            session,
+            extra_headers=extra_headers,
+            data=data,
+            timeout=timeout,
+            as_bytes=True
+        )
+    )
+
+
+def _seq_url_prefix(url):
+    """Build the url of a sequential request, up to the sequence number.
+
+    The query string is only encoded once, the sequence number is a plain
+    integer that can be appended to the result as is.
+
+    :param str url: The URL of the stream
+    :rtype: str
+    """
+    split_url = parse.urlsplit(url)
+    base_url = '%s://%s/%s?' % (split_url.scheme, split_url.netloc, split_url.path)
+    querys = dict(parse.parse_qsl(split_url.query))
+    querys.pop('sq', None)
+    if querys:
+        return f"{base_url}{parse.urlencode(querys)}&sq="
+    return f"{base_url}sq="
+
+
 async def seq_stream(
     url,
     session,
     timeout=900,
-    max_retries=0
+    max_retries=0,
+    concurrency=6
 ):
     """Read the response in sequence.
     :param str url: The URL to perform the GET request for.
+    :param int concurrency: Number of segments downloaded at the same time.
     :rtype: Iterable[bytes]
     """
     # YouTube expects a request sequence number as part of the parameters.
-    split_url = parse.urlsplit(url)
-    base_url = '%s://%s/%s?' % (split_url.scheme, split_url.netloc, split_url.path)
-
-    querys = dict(parse.parse_qsl(split_url.query))
+    seq_url = _seq_url_prefix(url)
 
     # The 0th sequential request provides the file headers, which tell us
     #  information about how the file is segmented.
-    querys['sq'] = 0
-    url = base_url + parse.urlencode(querys)
+    url = f"{seq_url}0"
 
-    segment_data = b''
+    # We can then parse the header to find the number of segments, only the
+    #  end of the previous chunk is kept in case the count is split across two
+    segment_count = None
+    tail = b''
     async for chunk in stream(url, session, timeout=timeout, max_retries=max_retries):
         yield chunk
-        segment_data += chunk
+        if segment_count is None:
+            segment_data = tail + chunk
+            match = _SEGMENT_COUNT_RE.search(segment_data)
+            # a match at the very end may still be missing some digits
+            if match and match.end() < len(segment_data):
+                segment_count = int(match.group(1))
+            else:
+                tail = segment_data[-_SEGMENT_COUNT_TAIL_SIZE:]
 
-    # We can then parse the header to find the number of segments
-    stream_info = segment_data.split(b'\r\n')
-    segment_count_pattern = re.compile(b'Segment-Count: (\\d+)')
-    for line in stream_info:
-        match = segment_count_pattern.search(line)
-        if match:
-            segment_count = int(match.group(1).decode('utf-8'))
-
-    # We request these segments sequentially to build the file.
-    seq_num = 1
-    while seq_num <= segment_count:
-        # Create sequential request URL
-        querys['sq'] = seq_num
-        url = base_url + parse.urlencode(querys)
+    if segment_count is None:
+        match = _SEGMENT_COUNT_RE.search(tail)
+        if not match:
+            raise RegexMatchError('seq_stream', _SEGMENT_COUNT_RE.pattern)
+        segment_count = int(match.group(1))
 
-        await stream(url, session, timeout=timeout, max_retries=max_retries)
-        seq_num += 1
+    # We request the next segments concurrently, but yield them in sequence
+    #  to build the file.
+    segments = deque()
+    seq_num = 1
+    try:
+        while seq_num <= segment_count or segments:
+            while seq_num <= segment_count and len(segments) < concurrency:
+                # Create sequential request URL
+                url = f"{seq_url}{seq_num}"
+                segments.append(asyncio.ensure_future(
+                    _read_segment(url, session, timeout, max_retries)
+                ))
+                seq_num += 1
+            # the chunks are yielded as they were read, so progress is still
+            #  reported per chunk
+            for chunk in await segments.popleft():
+                yield chunk
+    finally:
+        for segment in segments:
+            if not segment.done():
+                segment.cancel()
+            elif not segment.cancelled():
+                # retrieve any error, so it isn't logged as never retrieved
+                segment.exception()
     return  # pylint: disable=R1711
 
 
+async def _read_segment(url, session, timeout, max_retries):
+    """Read a whole segment of a sequential stream.
+    :param str url: The URL of the segment.
+    :rtype: List[bytes]
+    :returns: The chunks of the segment, in order
+    """
+    return [
+        chunk async for chunk in stream(
+            url, session, timeout=timeout, max_retries=max_retries
+        )
+    ]
+
+
 async def stream(
     url,
     session,
@@ -208,74 +350,75 @@ async def stream(
                 file_size = int(content_range.split("/")[1])
             except (KeyError, IndexError, ValueError) as e:
                 logger.error(e)
-        while True:
-            chunk = await response.content.read(default_chunk_size)
-            if not chunk:
-                break
+        async for chunk in response.content.iter_chunked(default_chunk_size):
             downloaded += len(chunk)
             yield chunk
     return  # pylint: disable=R1711
 
 
-@lru_cache()
+def _cache_filesize(cache, url, size):
+    """Store a fetched file size, dropping the oldest once the cache is full.
+
+    Stream urls are signed and expire, so old entries are never hit again.
+    """
+    cache[url] = size
+    if len(cache) > _FILESIZE_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
 async def filesize(url, session):
     """Fetch size in bytes of file at given URL
 
     :param str url: The URL to get the size of
     :returns: int: size in bytes of remote file
     """
-    return int((await head(url, session))["content-length"])
+    if url in _filesize_cache:
+        _filesize_cache.move_to_end(url)
+        return _filesize_cache[url]
+    size = int((await head(url, session))["content-length"])
+    _cache_filesize(_filesize_cache, url, size)
+    return size
 
 
-@lru_cache()
 async def seq_filesize(url, session):
     """Fetch size in bytes of file at given URL from sequential requests
 
     :param str url: The URL to get the size of
     :returns: int: size in bytes of remote file
     """
+    if url in _seq_filesize_cache:
+        _seq_filesize_cache.move_to_end(url)
+        return _seq_filesize_cache[url]
     total_filesize = 0
     # YouTube expects a request sequence number as part of the parameters.
-    split_url = parse.urlsplit(url)
-    base_url = '%s://%s/%s?' % (split_url.scheme, split_url.netloc, split_url.path)
-    querys = dict(parse.parse_qsl(split_url.query))
+    seq_url = _seq_url_prefix(url)
 
     # The 0th sequential request provides the file headers, which tell us
     #  information about how the file is segmented.
-    querys['sq'] = 0
-    url = base_url + parse.urlencode(querys)
+    segment_url = f"{seq_url}0"
     response = await _execute_request(
-        url, session, method="GET"
+        segment_url, session, method="GET"
     )
 
-    response_value = await response.text()
+    response_value = await response.read()
     # The file header must be added to the total filesize
     total_filesize += len(response_value)
 
     # We can then parse the header to find the number of segments
-    segment_count = 0
-    stream_info = response_value.split(b'\r\n')
-    segment_regex = b'Segment-Count: (\\d+)'
-    for line in stream_info:
-        # One of the lines should contain the segment count, but we don't know
-        #  which, so we need to iterate through the lines to find it
-        try:
-            segment_count = int(regex_search(segment_regex, line, 1))
-        except RegexMatchError:
-            pass
-
-    if segment_count == 0:
-        raise RegexMatchError('seq_filesize', segment_regex)
+    match = _SEGMENT_COUNT_RE.search(response_value)
+    if not match:
+        raise RegexMatchError('seq_filesize', _SEGMENT_COUNT_RE.pattern)
+    segment_count = int(match.group(1))
 
     # We make HEAD requests to the segments sequentially to find the total filesize.
     seq_num = 1
     while seq_num <= segment_count:
         # Create sequential request URL
-        querys['sq'] = seq_num
-        url = base_url + parse.urlencode(querys)
+        segment_url = f"{seq_url}{seq_num}"
 
-        total_filesize += int((await head(url, session))['content-length'])
+        total_filesize += int((await head(segment_url, session))['content-length'])
         seq_num += 1
+    _cache_filesize(_seq_filesize_cache, url, total_filesize)
     return total_filesize
 
 
@@ -291,5 +434,30 @@ async def head(url, session):
     response_headers = (await _execute_request(url, session, method="HEAD")).headers
     return {k.lower(): v for k, v in response_headers.items()}
 
-def createSession():
-    return aiohttp.ClientSession()
\ No newline at end of file
+def createSession(cookie_jar=None):
+    """Create a session pooling its connections to the youtube servers.
+
+    The same session should be passed to every object that makes requests,
+    so keep-alive connections are reused instead of opening new ones.
+
+    :param aiohttp.abc.AbstractCookieJar cookie_jar:
+        (optional) Cookies to send, e.g. those of a logged in account.
+        Defaults to a jar holding only the consent cookie.
+    :rtype: aiohttp.ClientSession
+    """
+    if cookie_jar is None:
+        cookie_jar = aiohttp.CookieJar()
+        # without it clients in the EU are redirected to the consent page,
+        #  which has no ytInitialData to extract
+        cookie_jar.update_cookies(_CONSENT_COOKIE, yarl.URL("https://www.youtube.com/"))
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=10,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        ),
+        timeout=aiohttp.ClientTimeout(total=900),
+        headers=_BASE_HEADERS,
+        cookie_jar=cookie_jar
+    )
@@ -13,12 +13,24 @@ with codecs.open(os.path.join(here, "README.md"), encoding="utf-8") as fh:
 with open(os.path.join(here, "pytube", "version.py")) as fp:
     exec(fp.read())
 
+# The playlist extraction can optionally be compiled to a C extension,
+# install with PYTUBE_USE_MYPYC=1 and mypy available to do so.
+ext_modules = []
+if os.getenv("PYTUBE_USE_MYPYC") == "1":
+    from mypyc.build import mypycify
+
+    # only this module is type checked, the rest of pytube stays pure python
+    ext_modules = mypycify(
+        ["--follow-imports=skip", "pytube/contrib/_playlist_fast.py"]
+    )
+
 setup(
     name="pytube",
     version=__version__,  # noqa: F821
     author="Mike Semple, Ronnie Ghose, Taylor Fox Dahlin, Nick Ficano",
     author_email="hey@pytube.io",
     packages=["pytube", "pytube.contrib"],
+    ext_modules=ext_modules,
     package_data={"": ["LICENSE"],},
     url="https://github.com/msemple1111/pytube",
     license="The Unlicense (Unlicense)",
@@ -54,5 +66,8 @@ setup(
         'aiohttp',
         'async_property'
       ],
+    extras_require={
+        "speedups": ["orjson", "pysimdjson"],
+    },
     keywords=["youtube", "download", "video", "stream",],
 )